@@ -1,14 +1,26 @@
 import streamlit as st
-import pandas as pd
-import pyperclip
-from sparql_utils import execute_sparql_query, search_wikidata_entities
+from sparql_utils import execute_sparql_query, search_wikidata_entities, ENDPOINTS_AVAILABLE
 from query_templates import WIKIDATA_TEMPLATES
+from result_export import EXPORT_FORMATS, export_raw_results_to_bytes
+from federation import fan_out_query
+import result_cache
 
 st.set_page_config(layout="wide", page_title="SPARQL Query Builder")
 
 SEARCH_TYPE_DISPLAY_OPTIONS = ("Клас (QID)", "Предикат (PID)")
 DEFAULT_TEMPLATE_KEY = "Празен"
 TEXT_AREA_KEY = "query_text_main_area_ta_widget_state"
+EXPORT_FORMAT_OPTIONS = {
+    "Parquet": "parquet",
+    "Arrow IPC": "arrow",
+    "JSON Lines": "jsonl",
+    "CSV (zstd)": "csv.zst",
+    "CSV": "csv",
+}
+FANOUT_POLICY_OPTIONS = {
+    "Всички отговори": "all",
+    "Първият отговор": "first",
+}
 
 def init_session_state():
     defaults = {
@@ -23,7 +35,10 @@ def init_session_state():
         'results_df': None,
         'raw_results_response': None,
         'query_error_message': None,
-        'endpoint_selectbox_key_value': "Wikidata"
+        'endpoint_selectbox_key_value': "Wikidata",
+        'fanout_report': None,
+        'result_delta': None,
+        'result_not_modified': False
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -36,11 +51,6 @@ def init_session_state():
 
 init_session_state()
 
-ENDPOINTS_AVAILABLE = {
-    "Wikidata": "https://query.wikidata.org/sparql",
-    "Europeana": "http://sparql.europeana.eu/",
-}
-
 def update_search_type():
     selected_display_value = st.session_state.search_type_radio_widget_key
     if selected_display_value == SEARCH_TYPE_DISPLAY_OPTIONS[0]: new_type = "item"
@@ -72,6 +82,38 @@ def clear_all_query_related_state():
     st.session_state.raw_results_response = None
     st.session_state.query_error_message = None
 
+def fanout_endpoint_urls():
+    urls = [ENDPOINTS_AVAILABLE[name] for name in st.session_state.get("fanout_endpoints_ms", [])]
+    urls += [url.strip() for url in st.session_state.get("fanout_extra_urls_ti", "").split(",") if url.strip()]
+    return list(dict.fromkeys(urls))
+
+def render_export_controls(raw_results):
+    col_fmt, col_btn = st.columns([2, 1])
+    with col_fmt:
+        format_label = st.selectbox("Експорт формат:", list(EXPORT_FORMAT_OPTIONS.keys()), key="export_format_selectbox_key")
+    export_format = EXPORT_FORMAT_OPTIONS[format_label]
+    prepared = st.session_state.get("export_payload")
+    with col_btn:
+        if prepared and prepared[0] is raw_results and prepared[1] == export_format:
+            extension, mime = EXPORT_FORMATS[export_format]
+            st.download_button("⬇ Свали", data=prepared[2], file_name=f"results{extension}", mime=mime, key="download_export_btn")
+        elif st.button("Подготви файл", key="prepare_export_btn"):
+            with st.spinner("Експортирам резултатите..."):
+                st.session_state.export_payload = (raw_results, export_format, export_raw_results_to_bytes(raw_results, export_format))
+            st.rerun()
+
+def render_result_delta(delta):
+    variables, added, removed = delta
+    with st.expander(f"Промени спрямо предишното изпълнение: +{len(added)} / -{len(removed)} реда"):
+        if not added and not removed:
+            st.info("Няма добавени или премахнати редове.")
+        if added:
+            st.caption("Добавени редове:")
+            st.dataframe([dict(zip(variables, row)) for row in added], use_container_width=True)
+        if removed:
+            st.caption("Премахнати редове:")
+            st.dataframe([dict(zip(variables, row)) for row in removed], use_container_width=True)
+
 def search_term_changed():
     st.query_params["search_term"] = st.session_state.search_term_input_key
     st.query_params["search_type"] = st.session_state.search_entity_type_param
@@ -100,6 +142,25 @@ with st.sidebar:
         found_name = next((name for name, url in ENDPOINTS_AVAILABLE.items() if url == custom_endpoint_input), "Custom")
         st.session_state.endpoint_selectbox_key_value = found_name
 
+    st.checkbox(
+        "Преизползвай съхранените резултати (ETag/Last-Modified)", value=True, key="revalidate_results_cb",
+        help=f"Отговорите се пазят в '{result_cache.DEFAULT_CACHE_DIR}'; непроменен резултат не се изтегля отново."
+    )
+    fanout_enabled = st.checkbox("Паралелно към няколко endpoint-а", key="fanout_enabled_cb")
+    if fanout_enabled:
+        st.multiselect(
+            "Endpoint-и:", options=list(ENDPOINTS_AVAILABLE.keys()),
+            default=[name for name in ENDPOINTS_AVAILABLE if name == st.session_state.endpoint_selectbox_key_value],
+            key="fanout_endpoints_ms"
+        )
+        st.text_input("Допълнителни URL-и (със запетая):", key="fanout_extra_urls_ti")
+        st.radio("Политика:", list(FANOUT_POLICY_OPTIONS.keys()), horizontal=True, key="fanout_policy_radio")
+        st.number_input("Таймаут по подразбиране (сек.):", min_value=1, max_value=600, value=60, key="fanout_timeout_ni")
+        with st.expander("Таймаут за всеки endpoint"):
+            for url in fanout_endpoint_urls():
+                st.number_input(url, min_value=1, max_value=600, value=st.session_state.fanout_timeout_ni, key=f"fanout_timeout_ni_{url}")
+        st.checkbox("Премахни дублираните редове", key="fanout_dedupe_cb")
+
     st.markdown("---")
     st.subheader("Wikidata Entity Search")
     st.caption("Търси Wikidata QIDs (класове) и PIDs (предикати).")
@@ -138,6 +199,7 @@ with st.sidebar:
                     with col2_res:
                         id_to_copy = f"{prefix_to_use}{item_id}"
                         if st.button(f"Копирай код", key=f"copy_{item_id}_btn"):
+                            import pyperclip # Only needed once a copy button is pressed
                             try:
                                 pyperclip.copy(id_to_copy)
                                 st.toast(f"Копирано '{id_to_copy}' в клипборда!", icon="📋")
@@ -200,16 +262,43 @@ with col_query:
         st.session_state.results_df = None 
         st.session_state.raw_results_response = None
         st.session_state.query_error_message = None
+        st.session_state.fanout_report = None
+        st.session_state.result_delta = None
+        st.session_state.result_not_modified = False
 
         if not st.session_state.current_query_text.strip(): 
             st.session_state.query_error_message = "Заявката е празна. Въведи текст."
+        elif st.session_state.get("fanout_enabled_cb"):
+            query_to_run = st.session_state.current_query_text
+            endpoints_to_run = fanout_endpoint_urls()
+            timeouts_to_use = {url: st.session_state[f"fanout_timeout_ni_{url}"] for url in endpoints_to_run
+                               if f"fanout_timeout_ni_{url}" in st.session_state}
+            with st.spinner(f"Изпълнявам заявка с {len(endpoints_to_run)} endpoint-а..."):
+                df_res, report, err_msg = fan_out_query(
+                    query_to_run, endpoints_to_run,
+                    policy=FANOUT_POLICY_OPTIONS[st.session_state.fanout_policy_radio],
+                    timeout=st.session_state.fanout_timeout_ni,
+                    timeouts=timeouts_to_use,
+                    dedupe=st.session_state.fanout_dedupe_cb
+                )
+            st.session_state.results_df = df_res
+            st.session_state.fanout_report = report
+            st.session_state.query_error_message = err_msg
+            if not err_msg:
+                st.session_state.last_successful_query = query_to_run
+                st.session_state.last_endpoint_for_success = ", ".join(r["endpoint"] for r in report if r["status"] == "ok")
         elif not st.session_state.selected_endpoint_url.strip():
             st.session_state.query_error_message = "Няма избрана крайна точка (сървър) за заявката."
         else:
             query_to_run = st.session_state.current_query_text
             endpoint_to_run = st.session_state.selected_endpoint_url
+            cache_dir = result_cache.DEFAULT_CACHE_DIR if st.session_state.revalidate_results_cb else None
             with st.spinner(f"Изпълнявам заявка с {endpoint_to_run}..."):
-                df_res, raw_res, err_msg = execute_sparql_query(query_to_run, endpoint_to_run)
+                df_res, raw_res, err_msg = execute_sparql_query(query_to_run, endpoint_to_run, cache_dir=cache_dir)
+            if cache_dir and not err_msg:
+                meta = result_cache.load_meta(cache_dir, endpoint_to_run, query_to_run)
+                st.session_state.result_not_modified = bool(meta and meta.get("last_status") == 304)
+                st.session_state.result_delta = result_cache.diff_rows(cache_dir, endpoint_to_run, query_to_run)
             st.session_state.results_df = df_res
             st.session_state.raw_results_response = raw_res
             st.session_state.query_error_message = err_msg
@@ -219,6 +308,9 @@ with col_query:
 
 with col_results:
     st.subheader("Резултати")
+    if st.session_state.query_executed_in_this_run and st.session_state.fanout_report:
+        st.caption("Принос и време за отговор по endpoint:")
+        st.dataframe(st.session_state.fanout_report, use_container_width=True, hide_index=True)
     if st.session_state.query_executed_in_this_run:
         if st.session_state.query_error_message:
             st.error(f"Грешка при изпълнение: {st.session_state.query_error_message}")
@@ -227,7 +319,13 @@ with col_results:
         elif st.session_state.results_df is not None:
             if not st.session_state.results_df.empty: st.success(f"Заявката е изпълнена. Попълнени {len(st.session_state.results_df)} реда.")
             else: st.info("Заявката е изпълнена, но няма съвпадащи резултати за нея.")
+            if st.session_state.result_not_modified:
+                st.caption("Резултатът не е променен (HTTP 304) – използвано е локалното копие.")
+            if st.session_state.result_delta is not None:
+                render_result_delta(st.session_state.result_delta)
             st.dataframe(st.session_state.results_df, use_container_width=True)
+            if isinstance(st.session_state.raw_results_response, dict):
+                render_export_controls(st.session_state.raw_results_response)
             if st.session_state.raw_results_response:
                 with st.expander("Върнат JSON"): st.json(st.session_state.raw_results_response)
         elif st.session_state.raw_results_response and "boolean" in st.session_state.raw_results_response:
@@ -0,0 +1,185 @@
+"""
+Headless batch runner: executes a directory or manifest of .rq files in parallel
+and streams every result into its own Parquet / Arrow IPC / JSON Lines / CSV file.
+
+    python batch_runner.py queries/ -o out/ -p lang=bg -j 4 -f parquet
+    python batch_runner.py manifest.json -o out/
+
+A manifest is a JSON list of objects with a required "query" (path to an .rq file,
+relative to the manifest) and optional "name", "endpoint" and "params".
+Placeholders in the query are written as {{name}}. Progress is appended to
+<out>/_progress.jsonl, so rerunning the same command skips finished queries.
+Does not import Streamlit.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sparql_core import resolve_endpoint
+from result_export import EXPORT_FORMATS, stream_query_export
+
+PROGRESS_FILE = "_progress.jsonl"
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+def load_jobs(source, default_endpoint, cli_params):
+    """Builds the job list from a directory of .rq files or a JSON manifest."""
+    if os.path.isdir(source):
+        entries = [{"query": name} for name in sorted(os.listdir(source)) if name.endswith(".rq")]
+        base_dir = source
+    else:
+        with open(source, encoding="utf-8") as f:
+            entries = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(source))
+
+    jobs = []
+    for entry in entries:
+        query_path = os.path.join(base_dir, entry["query"])
+        params = dict(entry.get("params", {}))
+        params.update(cli_params)
+        jobs.append({
+            "name": entry.get("name") or os.path.splitext(os.path.basename(query_path))[0],
+            "query_path": query_path,
+            "endpoint": resolve_endpoint(entry.get("endpoint") or default_endpoint),
+            "params": params,
+        })
+    for job in jobs:
+        name = job["name"]
+        if name in (".", "..") or "/" in name or "\\" in name or os.path.basename(name) != name:
+            raise ValueError(f"Job name '{name}' must be a plain file name without path separators")
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate job names: {', '.join(duplicates)}")
+    return jobs
+
+def render_query(template, params):
+    """Substitutes {{name}} placeholders; a missing parameter is an error."""
+    missing = sorted({m.group(1) for m in PLACEHOLDER_RE.finditer(template) if m.group(1) not in params})
+    if missing:
+        raise ValueError(f"Missing query parameters: {', '.join(missing)}")
+    return PLACEHOLDER_RE.sub(lambda m: str(params[m.group(1)]), template)
+
+def job_fingerprint(query_text, endpoint_url, output_format):
+    return hashlib.sha256(f"{endpoint_url}\n{output_format}\n{query_text}".encode("utf-8")).hexdigest()
+
+def load_progress(out_dir):
+    """Returns the latest _progress.jsonl record for every job name."""
+    progress = {}
+    path = os.path.join(out_dir, PROGRESS_FILE)
+    if not os.path.exists(path):
+        return progress
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # Partially written line from an interrupted run
+            progress[record["name"]] = record
+    return progress
+
+def run_job(job, out_dir, output_format, timeout=60):
+    """Streams the response into a temporary file and renames it into place on success."""
+    started = time.monotonic()
+    record = {"name": job["name"], "endpoint": job["endpoint"], "fingerprint": job["fingerprint"]}
+    output_path = os.path.join(out_dir, job["name"] + EXPORT_FORMATS[output_format][0])
+    tmp_path = output_path + ".part"
+    try:
+        rows, err_msg = stream_query_export(job["query_text"], job["endpoint"], tmp_path, output_format, timeout=timeout)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if err_msg:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        record.update(status="error", error=err_msg)
+    else:
+        os.replace(tmp_path, output_path)
+        record.update(status="ok", rows=rows, output=os.path.basename(output_path))
+    record["seconds"] = round(time.monotonic() - started, 3)
+    return record
+
+def run_batch(jobs, out_dir, output_format="parquet", max_workers=4, force=False, timeout=60, log=print):
+    """
+    Runs the jobs with at most max_workers concurrent queries.
+    Returns the list of progress records written in this run.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    progress = {} if force else load_progress(out_dir)
+    pending, records = [], []
+
+    for job in jobs:
+        try:
+            with open(job["query_path"], encoding="utf-8") as f:
+                job["query_text"] = render_query(f.read(), job["params"])
+        except (OSError, ValueError) as e:
+            records.append({"name": job["name"], "status": "error", "error": str(e)})
+            log(f"[error] {job['name']}: {e}")
+            continue
+        job["fingerprint"] = job_fingerprint(job["query_text"], job["endpoint"], output_format)
+        previous = progress.get(job["name"])
+        if (previous and previous.get("status") == "ok" and previous.get("fingerprint") == job["fingerprint"]
+                and os.path.exists(os.path.join(out_dir, previous["output"]))):
+            log(f"[skip] {job['name']}: already done")
+            continue
+        pending.append(job)
+
+    with open(os.path.join(out_dir, PROGRESS_FILE), "a", encoding="utf-8") as progress_file, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_job, job, out_dir, output_format, timeout): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"name": job["name"], "fingerprint": job["fingerprint"], "status": "error", "error": str(e)}
+            progress_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            progress_file.flush()
+            records.append(record)
+            if record["status"] == "ok":
+                log(f"[ok] {record['name']}: {record['rows']} rows in {record['seconds']}s -> {record['output']}")
+            else:
+                log(f"[error] {record['name']}: {record['error']}")
+    return records
+
+def parse_param(value):
+    name, sep, param_value = value.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"Expected name=value, got '{value}'")
+    return name, param_value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run SPARQL query files in parallel without the Streamlit UI.")
+    parser.add_argument("source", help="Directory with .rq files or a JSON manifest.")
+    parser.add_argument("-o", "--out-dir", required=True, help="Directory for results and progress.")
+    parser.add_argument("-e", "--endpoint", default="Wikidata", help="Endpoint name or URL (default: Wikidata).")
+    parser.add_argument("-p", "--param", action="append", type=parse_param, default=[], help="Query parameter name=value, repeatable.")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="Maximum concurrent queries (default: 4).")
+    parser.add_argument("-f", "--format", choices=list(EXPORT_FORMATS), default="parquet", help="Output format.")
+    parser.add_argument("-t", "--timeout", type=int, default=60, help="Timeout per query in seconds (default: 60).")
+    parser.add_argument("--force", action="store_true", help="Ignore previous progress and rerun everything.")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.timeout <= 0:
+        parser.error("--timeout must be positive")
+    try:
+        jobs = load_jobs(args.source, args.endpoint, dict(args.param))
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(f"Cannot load queries from '{args.source}': {e}")
+
+    records = run_batch(jobs, args.out_dir, args.format, args.workers, args.force, args.timeout,
+                        log=lambda msg: print(msg, file=sys.stderr))
+    return 1 if any(r["status"] != "ok" for r in records) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
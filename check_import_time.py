@@ -0,0 +1,69 @@
+"""
+Import-time budget check for the Streamlit-free core.
+
+Imports each module in a fresh interpreter with `python -X importtime` and fails
+if the cumulative import time exceeds its budget or if a heavy dependency
+(streamlit, pandas, pyarrow, rdflib, requests) is loaded eagerly.
+
+    python check_import_time.py
+"""
+import os
+import subprocess
+import sys
+
+# Module -> budget in milliseconds for its cumulative import time.
+IMPORT_BUDGETS_MS = {
+    "sparql_core": 50,
+    "result_export": 50,
+    "federation": 50,
+    "result_cache": 50,
+    "batch_runner": 100,
+}
+FORBIDDEN_EAGER_IMPORTS = ("streamlit", "pandas", "pyarrow", "rdflib", "requests")
+
+def measure_import(module_name):
+    """
+    Returns (cumulative_ms, imported_module_names) for importing module_name
+    in a fresh interpreter, parsed from the -X importtime report on stderr.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    cumulative_us = None
+    imported = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue # Header line of the report
+        imported.append(name.strip())
+        if name.strip() == module_name:
+            cumulative_us = int(cumulative)
+    if cumulative_us is None:
+        raise RuntimeError(f"No import time reported for '{module_name}'.")
+    return cumulative_us / 1000, imported
+
+def check_budgets(budgets=IMPORT_BUDGETS_MS, forbidden=FORBIDDEN_EAGER_IMPORTS):
+    """Returns a list of human-readable budget violations (empty if all pass)."""
+    failures = []
+    for module_name, budget_ms in budgets.items():
+        cumulative_ms, imported = measure_import(module_name)
+        eager = sorted({name.split(".")[0] for name in imported} & set(forbidden))
+        status = "ok"
+        if cumulative_ms > budget_ms:
+            failures.append(f"{module_name}: {cumulative_ms:.1f} ms exceeds the {budget_ms} ms budget")
+            status = "over budget"
+        if eager:
+            failures.append(f"{module_name}: eagerly imports {', '.join(eager)}")
+            status = "eager imports"
+        print(f"{module_name}: {cumulative_ms:.1f} ms / {budget_ms} ms ({status})")
+    return failures
+
+if __name__ == "__main__":
+    failures = check_budgets()
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
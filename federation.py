@@ -0,0 +1,101 @@
+"""
+Fan-out of one SPARQL query to several endpoints in parallel, with the tabular
+results merged into a single DataFrame.
+
+Policies:
+    "all"   - wait for every endpoint (each bounded by its own timeout) and merge
+              all successful results.
+    "first" - return the first successful result and stop waiting for the rest.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from sparql_core import execute_sparql_query
+
+FANOUT_POLICIES = ("all", "first")
+SOURCE_COLUMN = "source_endpoint"
+
+def _run_endpoint(query_string, endpoint_url, timeout):
+    started = time.monotonic()
+    df, raw, err_msg = execute_sparql_query(query_string, endpoint_url, timeout=timeout)
+    if not err_msg and df is None and isinstance(raw, dict) and "boolean" in raw:
+        import pandas as pd
+        df = pd.DataFrame({"boolean": [raw["boolean"]]})
+    if not err_msg and df is None:
+        err_msg = "Заявката не върна таблични резултати."
+    return df, err_msg, time.monotonic() - started
+
+def fan_out_query(query_string, endpoint_urls, policy="all", timeout=60, timeouts=None,
+                  dedupe=False, source_column=SOURCE_COLUMN):
+    """
+    Runs query_string against every URL in endpoint_urls concurrently.
+    timeouts optionally maps an endpoint URL to its own timeout in seconds.
+    Returns a tuple: (merged pandas.DataFrame or None, per-endpoint report list, error_message_str or None)
+
+    Each report entry has "endpoint", "status" ("ok", "error", "timeout" or "skipped"),
+    "rows", "kept_rows" (rows left after deduplication), "seconds" and "error".
+    """
+    import pandas as pd
+
+    if policy not in FANOUT_POLICIES:
+        raise ValueError(f"Unknown fan-out policy: {policy}")
+    endpoint_urls = list(dict.fromkeys(endpoint_urls))
+    if not endpoint_urls:
+        return None, [], "Няма избрани endpoint-и."
+    timeouts = timeouts or {}
+
+    reports = {url: {"endpoint": url, "status": "skipped", "rows": None, "kept_rows": None, "seconds": None, "error": None}
+               for url in endpoint_urls}
+    frames = {}
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=len(endpoint_urls))
+    try:
+        futures = {}
+        deadlines = {}
+        for url in endpoint_urls:
+            endpoint_timeout = timeouts.get(url, timeout)
+            future = executor.submit(_run_endpoint, query_string, url, endpoint_timeout)
+            futures[future] = url
+            deadlines[future] = started + endpoint_timeout
+
+        pending = set(futures)
+        while pending:
+            wait_for = max(0, min(deadlines[f] for f in pending) - time.monotonic())
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = futures[future]
+                try:
+                    df, err_msg, seconds = future.result()
+                except Exception as e:
+                    df, err_msg, seconds = None, f"Незнайна грешка: {e}", time.monotonic() - started
+                reports[url].update(seconds=round(seconds, 3))
+                if err_msg:
+                    reports[url].update(status="error", error=err_msg)
+                else:
+                    reports[url].update(status="ok", rows=len(df))
+                    frames[url] = df
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines[f] <= now]:
+                url = futures[future]
+                reports[url].update(status="timeout", seconds=round(now - started, 3),
+                                    error=f"{timeouts.get(url, timeout)}-секундовият таймаут мина за: {url}.")
+                pending.discard(future)
+            if policy == "first" and frames:
+                break
+    finally:
+        # Do not wait for slow endpoints; their threads finish in the background.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not frames:
+        errors = "; ".join(f"{r['endpoint']}: {r['error']}" for r in reports.values() if r["error"])
+        return None, list(reports.values()), f"Нито един endpoint не върна резултат. {errors}".strip()
+
+    ordered = [url for url in endpoint_urls if url in frames]
+    merged = pd.concat([frames[url].assign(**{source_column: url}) for url in ordered], ignore_index=True)
+    if dedupe:
+        value_columns = [c for c in merged.columns if c != source_column]
+        merged = merged.drop_duplicates(subset=value_columns or None, keep="first", ignore_index=True)
+    kept = merged[source_column].value_counts()
+    for url in ordered:
+        reports[url]["kept_rows"] = int(kept.get(url, 0))
+    return merged, list(reports.values()), None
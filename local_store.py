@@ -0,0 +1,363 @@
+"""
+Embedded read-only triple store for querying local RDF dumps (N-Triples) with
+rdflib's SPARQL evaluator, without a remote endpoint.
+
+Layout of a store directory:
+    terms.bin, terms_offsets.npy  - dictionary: UTF-8 N-Triples terms sorted by
+                                    code point; a term's id is its rank
+    spo.npy, pos.npy, osp.npy     - the triples as (3, n) id arrays sorted in
+                                    subject/predicate/object permutation order
+    meta.json                     - triple and term counts
+
+All arrays are opened memory-mapped, so opening a store is cheap and lookups
+only touch the pages a binary search needs.
+
+    python local_store.py load wikidata-subset.nt.gz -o local_store
+"""
+import argparse
+import bz2
+import gzip
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from array import array
+from functools import lru_cache
+
+import numpy as np
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.store import Store
+
+META_FILE = "meta.json"
+TERMS_FILE = "terms.bin"
+OFFSETS_FILE = "terms_offsets.npy"
+# Permutation name -> which of (s, p, o) is stored in each of its rows
+PERMUTATIONS = {"spo": (0, 1, 2), "pos": (1, 2, 0), "osp": (2, 0, 1)}
+SCAN_CHUNK = 65536
+# rdflib's SPARQL parser keeps shared state and is not thread-safe.
+_QUERY_LOCK = threading.Lock()
+
+_TERM = r'(<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z]+(?:-[A-Za-z0-9]+)*|\^\^<[^>]*>)?)'
+NTRIPLE_RE = re.compile(r"^\s*" + _TERM + r"\s+" + _TERM + r"\s+" + _TERM + r"\s*\.\s*(?:#.*)?$")
+ESCAPE_RE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+LITERAL_RE = re.compile(r'^"((?:[^"\\]|\\.)*)"(?:@(.+)|\^\^<(.*)>)?$', re.DOTALL)
+SIMPLE_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+class LocalStoreError(Exception):
+    """Raised for missing or malformed local store directories and dump lines."""
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    def replace(m):
+        if m.group(3) is not None:
+            return SIMPLE_ESCAPES.get(m.group(3), m.group(0))
+        return chr(int(m.group(1) or m.group(2), 16))
+    return ESCAPE_RE.sub(replace, text)
+
+def _escape_literal(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+
+def _canonical(term):
+    """Normalises the escaping of an N-Triples term so equal terms share one dictionary key."""
+    if term.startswith("<"):
+        return "<" + _unescape(term[1:-1]) + ">"
+    if term.startswith('"'):
+        m = LITERAL_RE.match(term)
+        lexical, lang, datatype = m.group(1), m.group(2), m.group(3)
+        suffix = f"@{lang.lower()}" if lang else (f"^^<{_unescape(datatype)}>" if datatype else "")
+        return '"' + _escape_literal(_unescape(lexical)) + '"' + suffix
+    return term
+
+def term_to_key(term):
+    """rdflib term -> canonical N-Triples key used in the dictionary."""
+    if isinstance(term, URIRef):
+        return f"<{term}>"
+    if isinstance(term, BNode):
+        return f"_:{term}"
+    if isinstance(term, Literal):
+        if term.language:
+            suffix = f"@{term.language.lower()}"
+        elif term.datatype:
+            suffix = f"^^<{term.datatype}>"
+        else:
+            suffix = ""
+        return '"' + _escape_literal(str(term)) + '"' + suffix
+    return None
+
+def key_to_term(key):
+    """Canonical N-Triples key -> rdflib term."""
+    if key.startswith("<"):
+        return URIRef(key[1:-1])
+    if key.startswith("_:"):
+        return BNode(key[2:])
+    m = LITERAL_RE.match(key)
+    # normalize=False keeps the stored lexical form, so the term maps back to the same key in joins.
+    return Literal(_unescape(m.group(1)), lang=m.group(2), datatype=URIRef(m.group(3)) if m.group(3) else None, normalize=False)
+
+def _open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+def bulk_load(dump_paths, store_path, log=print):
+    """
+    Builds a store directory from one or more N-Triples dumps (.nt, .nt.gz, .nt.bz2).
+    Duplicate triples are dropped. Returns the number of distinct triples.
+
+    The files are written to a temporary directory and renamed into place, so a
+    process that still has the old store memory-mapped keeps reading the old files.
+    """
+    term_ids = {}
+    encoded = array("Q")
+    for dump_path in dump_paths:
+        with _open_dump(dump_path) as dump:
+            for line_no, line in enumerate(dump, 1):
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                m = NTRIPLE_RE.match(line)
+                if not m:
+                    raise LocalStoreError(f"{dump_path}:{line_no}: not a valid N-Triples line")
+                for term in m.groups():
+                    key = _canonical(term)
+                    term_id = term_ids.get(key)
+                    if term_id is None:
+                        term_id = term_ids[key] = len(term_ids)
+                    encoded.append(term_id)
+                if line_no % 1000000 == 0:
+                    log(f"{dump_path}: {line_no} lines, {len(term_ids)} terms")
+
+    os.makedirs(store_path, exist_ok=True)
+    build_path = tempfile.mkdtemp(prefix=".build-", dir=store_path)
+    try:
+        terms = list(term_ids)
+        del term_ids
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        id_dtype = np.uint32 if len(terms) < 2 ** 32 else np.uint64
+        rank = np.empty(len(terms), dtype=id_dtype)
+        rank[np.asarray(order, dtype=np.int64)] = np.arange(len(terms), dtype=id_dtype)
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+        with open(os.path.join(build_path, TERMS_FILE), "wb") as terms_file:
+            position = 0
+            for i, term_index in enumerate(order, 1):
+                data = terms[term_index].encode("utf-8")
+                terms_file.write(data)
+                position += len(data)
+                offsets[i] = position
+        np.save(os.path.join(build_path, OFFSETS_FILE), offsets)
+        del terms, order
+
+        triples = rank[np.frombuffer(encoded, dtype=np.uint64).astype(np.int64)].reshape(-1, 3).T
+        del encoded, rank
+        spo_order = np.lexsort((triples[2], triples[1], triples[0]))
+        triples = triples[:, spo_order]
+        if triples.shape[1]:
+            keep = np.ones(triples.shape[1], dtype=bool)
+            keep[1:] = np.any(triples[:, 1:] != triples[:, :-1], axis=0)
+            triples = triples[:, keep]
+
+        for name, (a, b, c) in PERMUTATIONS.items():
+            if name == "spo":
+                permuted = triples
+            else:
+                perm_order = np.lexsort((triples[c], triples[b], triples[a]))
+                permuted = triples[[a, b, c]][:, perm_order]
+            np.save(os.path.join(build_path, f"{name}.npy"), np.ascontiguousarray(permuted))
+
+        with open(os.path.join(build_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"triples": int(triples.shape[1]), "terms": len(offsets) - 1}, f)
+        triple_count, term_count = int(triples.shape[1]), len(offsets) - 1
+        del triples
+
+        # meta.json goes last: readers treat it as the marker of a complete store.
+        for name in [TERMS_FILE, OFFSETS_FILE] + [f"{perm}.npy" for perm in PERMUTATIONS] + [META_FILE]:
+            os.replace(os.path.join(build_path, name), os.path.join(store_path, name))
+    finally:
+        shutil.rmtree(build_path, ignore_errors=True)
+    log(f"{store_path}: {triple_count} triples, {term_count} terms")
+    return triple_count
+
+class MmapStore(Store):
+    """Read-only rdflib store over a directory written by bulk_load."""
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        self._namespaces = {}
+        self._prefixes = {}
+        self._terms = None
+        super().__init__(configuration, identifier)
+
+    def open(self, configuration, create=False):
+        meta_path = os.path.join(configuration, META_FILE)
+        if not os.path.exists(meta_path):
+            raise LocalStoreError(f"No local store at '{configuration}'. Load one with: python local_store.py load <dump.nt> -o {configuration}")
+        with open(meta_path, encoding="utf-8") as f:
+            self._meta = json.load(f)
+        with open(os.path.join(configuration, TERMS_FILE), "rb") as f:
+            self._terms = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        self._offsets = np.load(os.path.join(configuration, OFFSETS_FILE), mmap_mode="r")
+        self._perms = {name: np.load(os.path.join(configuration, f"{name}.npy"), mmap_mode="r") for name in PERMUTATIONS}
+        self._decode = lru_cache(maxsize=1 << 18)(self._decode_uncached)
+        self._encode = lru_cache(maxsize=1 << 16)(self._encode_uncached)
+
+    def close(self, commit_pending_transaction=False):
+        if isinstance(self._terms, mmap.mmap):
+            self._terms.close()
+        self._terms = None
+
+    def _term_bytes(self, term_id):
+        return self._terms[int(self._offsets[term_id]):int(self._offsets[term_id + 1])]
+
+    def _decode_uncached(self, term_id):
+        return key_to_term(self._term_bytes(term_id).decode("utf-8"))
+
+    def _encode_uncached(self, key):
+        """Binary search in the sorted dictionary; None if the term is not in the store."""
+        key_bytes = key.encode("utf-8")
+        lo, hi = 0, self._meta["terms"]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_bytes(mid) < key_bytes:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._meta["terms"] and self._term_bytes(lo) == key_bytes:
+            return lo
+        return None
+
+    def _id_range(self, perm, bound_ids):
+        lo, hi = 0, perm.shape[1]
+        for row, term_id in zip(perm, bound_ids):
+            segment = row[lo:hi]
+            value = row.dtype.type(term_id)
+            lo, hi = lo + int(np.searchsorted(segment, value, "left")), lo + int(np.searchsorted(segment, value, "right"))
+        return lo, hi
+
+    def triples(self, triple_pattern, context=None):
+        ids = []
+        for term in triple_pattern:
+            if term is None:
+                ids.append(None)
+                continue
+            key = term_to_key(term)
+            term_id = self._encode(key) if key is not None else None
+            if term_id is None:
+                return
+            ids.append(term_id)
+        s, p, o = ids
+
+        if s is not None and p is None and o is not None:
+            name, bound = "osp", (o, s)
+        elif s is not None:
+            name, bound = "spo", tuple(t for t in (s, p, o) if t is not None)
+        elif p is not None:
+            name, bound = "pos", (p,) if o is None else (p, o)
+        elif o is not None:
+            name, bound = "osp", (o,)
+        else:
+            name, bound = "spo", ()
+
+        perm = self._perms[name]
+        s_pos, p_pos, o_pos = PERMUTATIONS[name].index(0), PERMUTATIONS[name].index(1), PERMUTATIONS[name].index(2)
+        lo, hi = self._id_range(perm, bound)
+        decode = self._decode
+        for start in range(lo, hi, SCAN_CHUNK):
+            block = perm[:, start:min(start + SCAN_CHUNK, hi)].tolist()
+            for row in zip(*block):
+                yield (decode(row[s_pos]), decode(row[p_pos]), decode(row[o_pos])), iter(())
+
+    def __len__(self, context=None):
+        return self._meta["triples"]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix, namespace, override=True):
+        self._namespaces[prefix] = namespace
+        self._prefixes[namespace] = prefix
+
+    def namespace(self, prefix):
+        return self._namespaces.get(prefix)
+
+    def prefix(self, namespace):
+        return self._prefixes.get(namespace)
+
+    def namespaces(self):
+        return iter(list(self._namespaces.items()))
+
+    def add(self, triple, context, quoted=False):
+        raise TypeError("The local store is read-only; rebuild it with bulk_load.")
+
+    def remove(self, triple, context=None):
+        raise TypeError("The local store is read-only; rebuild it with bulk_load.")
+
+@lru_cache(maxsize=4)
+def _open_local_graph_cached(store_path, meta_inode, meta_mtime_ns):
+    return Graph(store=MmapStore(store_path))
+
+def open_local_graph(store_path):
+    """Returns a cached graph for the store; a rebuilt store (new meta.json) is opened afresh."""
+    try:
+        meta_stat = os.stat(os.path.join(store_path, META_FILE))
+    except FileNotFoundError:
+        return Graph(store=MmapStore(store_path)) # Raises LocalStoreError with a hint
+    return _open_local_graph_cached(store_path, meta_stat.st_ino, meta_stat.st_mtime_ns)
+
+def _binding_json(term):
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    binding = {"type": "literal", "value": str(term)}
+    if term.language:
+        binding["xml:lang"] = term.language
+    elif term.datatype:
+        binding["datatype"] = str(term.datatype)
+    return binding
+
+def query_local_store(store_path, query_string):
+    """Runs a query with rdflib over the store and returns a SPARQL JSON results dict."""
+    graph = open_local_graph(os.path.abspath(store_path))
+    with _QUERY_LOCK:
+        result = graph.query(query_string)
+    if result.type == "ASK":
+        return {"head": {}, "boolean": bool(result.askAnswer)}
+    if result.type == "SELECT":
+        variables = [str(v) for v in result.vars]
+        rows = ((row.get(v) for v in result.vars) for row in result.bindings)
+    else: # CONSTRUCT / DESCRIBE: the resulting triples as ?subject ?predicate ?object
+        variables = ["subject", "predicate", "object"]
+        rows = iter(result.graph)
+    bindings = []
+    for row in rows:
+        bindings.append({v: _binding_json(term) for v, term in zip(variables, row) if term is not None})
+    return {"head": {"vars": variables}, "results": {"bindings": bindings}}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a local SPARQL store from N-Triples dumps.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    load_parser = subparsers.add_parser("load", help="Bulk load .nt / .nt.gz / .nt.bz2 files into a store directory.")
+    load_parser.add_argument("dumps", nargs="+")
+    load_parser.add_argument("-o", "--store", default="local_store", help="Store directory (default: local_store).")
+    args = parser.parse_args(argv)
+
+    try:
+        bulk_load(args.dumps, args.store, log=lambda msg: print(msg, file=sys.stderr))
+    except (OSError, LocalStoreError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+On-disk store of raw SPARQL JSON responses, used for HTTP revalidation
+(If-None-Match / If-Modified-Since) and for row-level diffs between runs.
+
+For every (endpoint, query) pair the store keeps, under a sha256 key:
+    <key>.json, <key>.fp            - latest response body and its row fingerprints
+    <key>.prev.json, <key>.prev.fp  - the same for the run before it
+    <key>.meta.json                 - ETag, Last-Modified and the last HTTP status
+
+The store is pruned after every write: entries not used for DEFAULT_MAX_AGE_SECONDS
+are removed, then the least recently used ones until it fits DEFAULT_MAX_BYTES.
+
+A row fingerprint is a 16-byte BLAKE2b digest of the row's values, so a diff
+compares fingerprint multisets and decodes only the rows that changed.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+from result_export import iter_raw_result_rows, iter_sparql_json_rows
+
+DEFAULT_CACHE_DIR = os.environ.get("SPARQL_RESULT_CACHE", ".sparql_cache")
+DEFAULT_MAX_BYTES = int(os.environ.get("SPARQL_RESULT_CACHE_MAX_MB", "200")) * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+FINGERPRINT_SIZE = 16
+
+def entry_key(endpoint_url, query_string):
+    return hashlib.sha256(f"{endpoint_url}\n{query_string}".encode("utf-8")).hexdigest()
+
+def _paths(cache_dir, endpoint_url, query_string):
+    base = os.path.join(cache_dir, entry_key(endpoint_url, query_string))
+    return {
+        "body": base + ".json",
+        "fp": base + ".fp",
+        "prev_body": base + ".prev.json",
+        "prev_fp": base + ".prev.fp",
+        "meta": base + ".meta.json",
+    }
+
+def _write_atomic(path, data):
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def load_meta(cache_dir, endpoint_url, query_string):
+    """Returns the stored metadata, or None if there is no stored body to revalidate."""
+    paths = _paths(cache_dir, endpoint_url, query_string)
+    if not os.path.exists(paths["meta"]) or not os.path.exists(paths["body"]):
+        return None
+    with open(paths["meta"], encoding="utf-8") as f:
+        return json.load(f)
+
+def conditional_headers(meta):
+    """Builds If-None-Match / If-Modified-Since request headers from stored metadata."""
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+def load_body(cache_dir, endpoint_url, query_string):
+    with open(_paths(cache_dir, endpoint_url, query_string)["body"], encoding="utf-8") as f:
+        return f.read()
+
+def row_fingerprints(raw_results):
+    """Concatenated FINGERPRINT_SIZE-byte digests, one per result row, in row order."""
+    rows = iter_raw_result_rows(raw_results)
+    next(rows)
+    digests = []
+    for row in rows:
+        data = "\x1f".join("\x00" if value is None else value for value in row)
+        digests.append(hashlib.blake2b(data.encode("utf-8"), digest_size=FINGERPRINT_SIZE).digest())
+    return b"".join(digests)
+
+def record_response(cache_dir, endpoint_url, query_string, body_text, raw_results, etag=None, last_modified=None):
+    """Stores a 200 response, keeping the previously stored one for diff_rows."""
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = _paths(cache_dir, endpoint_url, query_string)
+    if os.path.exists(paths["body"]) and os.path.exists(paths["fp"]):
+        os.replace(paths["body"], paths["prev_body"])
+        os.replace(paths["fp"], paths["prev_fp"])
+    else:
+        _remove(paths["prev_body"], paths["prev_fp"])
+    _write_atomic(paths["body"], body_text.encode("utf-8"))
+    _write_atomic(paths["fp"], row_fingerprints(raw_results))
+    meta = {
+        "etag": etag,
+        "last_modified": last_modified,
+        "last_status": 200,
+        "fetched_at": time.time(),
+        "vars": next(iter_raw_result_rows(raw_results)),
+    }
+    _write_atomic(paths["meta"], json.dumps(meta).encode("utf-8"))
+    prune(cache_dir, keep=entry_key(endpoint_url, query_string))
+
+def prune(cache_dir, max_bytes=DEFAULT_MAX_BYTES, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, keep=None):
+    """
+    Removes entries whose meta.json was not written (fetched or revalidated) within
+    max_age_seconds, then the least recently used entries until the store fits max_bytes.
+    The entry with key keep is never removed. Returns the number of removed entries.
+    """
+    entries = {}
+    for name in os.listdir(cache_dir):
+        key = name.split(".", 1)[0]
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entry = entries.setdefault(key, {"paths": [], "size": 0, "used_at": 0.0})
+        entry["paths"].append(path)
+        entry["size"] += stat.st_size
+        if name.endswith(".meta.json"):
+            entry["used_at"] = stat.st_mtime
+
+    now = time.time()
+    total = sum(entry["size"] for entry in entries.values())
+    removed = 0
+    for key, entry in sorted(entries.items(), key=lambda item: item[1]["used_at"]):
+        if key == keep:
+            continue
+        if now - entry["used_at"] <= max_age_seconds and total <= max_bytes:
+            break
+        _remove(*entry["paths"])
+        total -= entry["size"]
+        removed += 1
+    return removed
+
+def record_not_modified(cache_dir, endpoint_url, query_string):
+    """Marks the stored body as revalidated by a 304; nothing changed since the last run."""
+    paths = _paths(cache_dir, endpoint_url, query_string)
+    _remove(paths["prev_body"], paths["prev_fp"])
+    meta = load_meta(cache_dir, endpoint_url, query_string) or {}
+    meta.update(last_status=304, validated_at=time.time())
+    _write_atomic(paths["meta"], json.dumps(meta).encode("utf-8"))
+
+def _split_fingerprints(data):
+    return [data[i:i + FINGERPRINT_SIZE] for i in range(0, len(data), FINGERPRINT_SIZE)]
+
+def _rows_at(body_path, indexes):
+    """Streams a stored body and returns only the rows at the given positions."""
+    wanted = set(indexes)
+    with open(body_path, encoding="utf-8") as f:
+        rows = iter_sparql_json_rows(iter(lambda: f.read(1 << 16), ""))
+        next(rows)
+        return [row for i, row in enumerate(rows) if i in wanted]
+
+def diff_rows(cache_dir, endpoint_url, query_string):
+    """
+    Compares the latest stored result with the one before it.
+    Returns a tuple: (variables, added_rows, removed_rows), or None if there is no earlier run.
+    Duplicate rows are compared by count.
+    """
+    paths = _paths(cache_dir, endpoint_url, query_string)
+    meta = load_meta(cache_dir, endpoint_url, query_string)
+    if meta is None:
+        return None
+    variables = meta.get("vars", [])
+    if not os.path.exists(paths["prev_fp"]):
+        return (variables, [], []) if meta.get("last_status") == 304 else None
+
+    with open(paths["fp"], "rb") as f:
+        current = _split_fingerprints(f.read())
+    with open(paths["prev_fp"], "rb") as f:
+        previous = _split_fingerprints(f.read())
+
+    def changed_indexes(fingerprints, other):
+        remaining = Counter(other)
+        indexes = []
+        for i, fingerprint in enumerate(fingerprints):
+            if remaining[fingerprint]:
+                remaining[fingerprint] -= 1
+            else:
+                indexes.append(i)
+        return indexes
+
+    added_indexes = changed_indexes(current, previous)
+    removed_indexes = changed_indexes(previous, current)
+    added = _rows_at(paths["body"], added_indexes) if added_indexes else []
+    removed = _rows_at(paths["prev_body"], removed_indexes) if removed_indexes else []
+    return variables, added, removed
@@ -0,0 +1,223 @@
+"""
+Chunked export of SPARQL SELECT results to Parquet, Arrow IPC, JSON Lines and CSV
+(plain or zstd-compressed) without building a pandas DataFrame.
+
+Rows come either straight from a streamed endpoint response (the JSON body is
+decoded binding by binding as it arrives) or from an already stored raw
+SPARQL JSON result, and are written in record batches of DEFAULT_CHUNK_ROWS.
+All columns are written as nullable strings, matching execute_sparql_query.
+"""
+import codecs
+import json
+import re
+
+from sparql_core import LOCAL_ENDPOINT_PREFIX, USER_AGENT, query_local_endpoint
+
+DEFAULT_CHUNK_ROWS = 10000
+
+# Format -> (file extension, download MIME type)
+EXPORT_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+    "jsonl": (".jsonl", "application/jsonl"),
+    "csv": (".csv", "text/csv"),
+    "csv.zst": (".csv.zst", "application/zstd"),
+}
+
+BINDINGS_START_RE = re.compile(r'"bindings"\s*:\s*\[')
+HEAD_VARS_RE = re.compile(r'"vars"\s*:\s*(\[[^\]]*\])')
+
+class SparqlStreamError(ValueError):
+    """Raised when a streamed SPARQL JSON response cannot be decoded."""
+
+def iter_sparql_json_rows(text_chunks):
+    """
+    Incrementally decodes a SPARQL JSON results document from an iterable of str chunks.
+    Yields the variable list first, then one tuple of values (or None) per binding.
+    Bindings are decoded as they arrive when "head" precedes "results"; otherwise the
+    whole document is decoded at once so the columns still follow head.vars.
+    ASK results yield ["boolean"] and a single ("true",) / ("false",) row.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(text_chunks)
+    buffer = ""
+    exhausted = False
+
+    def read_more():
+        nonlocal buffer, exhausted
+        for chunk in chunks:
+            if chunk:
+                buffer += chunk
+                return True
+        exhausted = True
+        return False
+
+    match = BINDINGS_START_RE.search(buffer)
+    while not match:
+        if not read_more():
+            break
+        match = BINDINGS_START_RE.search(buffer)
+
+    if not match:
+        # No "bindings": a small document (ASK or an error), decode it in one go.
+        try:
+            document = json.loads(buffer)
+        except ValueError as e:
+            raise SparqlStreamError(f"Грешка при обработка на JSON: {e}") from e
+        if isinstance(document, dict) and "boolean" in document:
+            yield ["boolean"]
+            yield ("true" if document["boolean"] else "false",)
+            return
+        raise SparqlStreamError("Неочакван JSON.")
+
+    vars_match = HEAD_VARS_RE.search(buffer, 0, match.start())
+    if not vars_match:
+        # "head" comes after "results": the columns are only known at the end, so decode it in one go.
+        while read_more():
+            pass
+        try:
+            document = json.loads(buffer)
+        except ValueError as e:
+            raise SparqlStreamError(f"Грешка при обработка на JSON: {e}") from e
+        yield from iter_raw_result_rows(document)
+        return
+    variables = json.loads(vars_match.group(1))
+    yield variables
+    pos = match.end()
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buffer):
+            buffer, pos = "", 0
+            if not read_more():
+                raise SparqlStreamError("Отговорът прекъсна преди края на резултатите.")
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            binding, end = decoder.raw_decode(buffer, pos)
+        except ValueError as e:
+            if exhausted or not read_more():
+                raise SparqlStreamError(f"Грешка при обработка на JSON: {e}") from e
+            continue
+        pos = end
+        if len(buffer) > (1 << 20) and pos > len(buffer) // 2:
+            buffer, pos = buffer[pos:], 0
+        yield tuple(binding[v].get("value") if v in binding else None for v in variables)
+
+def iter_raw_result_rows(raw_results):
+    """Same contract as iter_sparql_json_rows, for an already decoded SPARQL JSON result."""
+    if "boolean" in raw_results:
+        yield ["boolean"]
+        yield ("true" if raw_results["boolean"] else "false",)
+        return
+    variables = raw_results.get("head", {}).get("vars", [])
+    yield variables
+    for binding in raw_results.get("results", {}).get("bindings", []):
+        yield tuple(binding[v].get("value") if v in binding else None for v in variables)
+
+def iter_chunks(rows, chunk_rows=DEFAULT_CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_rows(rows, sink, export_format, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Writes a row iterator (variables first, as produced by iter_*_rows) to sink,
+    a file path or a pyarrow NativeFile, in record batches of chunk_rows.
+    Returns the number of data rows written.
+    """
+    import pyarrow as pa
+
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    rows = iter(rows)
+    variables = next(rows)
+    schema = pa.schema([pa.field(v, pa.string()) for v in variables])
+
+    owns_sink = isinstance(sink, str)
+    stream = pa.OSFile(sink, "wb") if owns_sink else sink
+    if export_format == "csv.zst":
+        stream = pa.CompressedOutputStream(stream, "zstd")
+    written = 0
+    try:
+        if export_format == "jsonl":
+            for chunk in iter_chunks(rows, chunk_rows):
+                lines = "".join(json.dumps(dict(zip(variables, row)), ensure_ascii=False) + "\n" for row in chunk)
+                stream.write(lines.encode("utf-8"))
+                written += len(chunk)
+            return written
+
+        if export_format == "parquet":
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(stream, schema)
+        elif export_format == "arrow":
+            writer = pa.ipc.new_file(stream, schema)
+        else:
+            import pyarrow.csv as pa_csv
+            writer = pa_csv.CSVWriter(stream, schema)
+        with writer:
+            for chunk in iter_chunks(rows, chunk_rows):
+                columns = [pa.array(column, pa.string()) for column in zip(*chunk)]
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                written += len(chunk)
+            if not written and export_format == "csv":
+                writer.write_table(schema.empty_table()) # Header row only
+        return written
+    finally:
+        if owns_sink or export_format == "csv.zst":
+            stream.close()
+
+def stream_query_export(query_string, endpoint_url, sink, export_format, chunk_rows=DEFAULT_CHUNK_ROWS, timeout=60):
+    """
+    Executes a SELECT/ASK query and streams the JSON response straight into sink.
+    Returns a tuple: (rows_written or None, error_message_str or None)
+    """
+    if endpoint_url.startswith(LOCAL_ENDPOINT_PREFIX):
+        raw_results, err_msg = query_local_endpoint(query_string, endpoint_url)
+        if err_msg:
+            return None, err_msg
+        return write_rows(iter_raw_result_rows(raw_results), sink, export_format, chunk_rows), None
+
+    import requests
+
+    headers = {
+        "Accept": "application/sparql-results+json",
+        "User-Agent": USER_AGENT
+    }
+    params = {
+        "query": query_string,
+        "format": "json"
+    }
+    try:
+        with requests.get(endpoint_url, params=params, headers=headers, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").lower()
+            if "application/sparql-results+json" not in content_type and "application/json" not in content_type:
+                return None, f"Незнаен тип съдържание: {content_type}. Стрийминг експортът поддържа само JSON."
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            text_chunks = (decoder.decode(chunk) for chunk in response.iter_content(chunk_size=1 << 16))
+            return write_rows(iter_sparql_json_rows(text_chunks), sink, export_format, chunk_rows), None
+    except requests.exceptions.Timeout:
+        return None, f"{timeout}-секундовият таймаут мина за: {endpoint_url}."
+    except requests.exceptions.HTTPError as e_http:
+        error_detail = e_http.response.text[:500] if e_http.response is not None else str(e_http)
+        return None, f"HTTP грешка за заявка: {e_http}. Детайли: {error_detail}"
+    except requests.exceptions.RequestException as e_req:
+        return None, f"Рекуест грешка за заявка: {e_req}"
+    except SparqlStreamError as e_stream:
+        return None, str(e_stream)
+
+def export_raw_results_to_bytes(raw_results, export_format, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Encodes a stored raw SPARQL JSON result into the export format, for download buttons."""
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    write_rows(iter_raw_result_rows(raw_results), sink, export_format, chunk_rows)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,171 @@
+import io
+import json
+import os
+
+# requests, pandas and the local store (rdflib) are imported on first call so that importing this module stays cheap.
+
+USER_AGENT = "MyStreamlitSPARQLQueryBuilder/1.0 (Python requests; streamlit.io)"
+
+# Endpoint URLs with this prefix point to a local store directory built by local_store.py.
+LOCAL_ENDPOINT_PREFIX = "local://"
+
+ENDPOINTS_AVAILABLE = {
+    "Wikidata": "https://query.wikidata.org/sparql",
+    "Europeana": "http://sparql.europeana.eu/",
+    "Local": LOCAL_ENDPOINT_PREFIX + os.environ.get("SPARQL_LOCAL_STORE", "local_store"),
+}
+
+def resolve_endpoint(name_or_url):
+    """Returns the URL for a name from ENDPOINTS_AVAILABLE, or the argument itself if it is already a URL."""
+    return ENDPOINTS_AVAILABLE.get(name_or_url, name_or_url)
+
+def fetch_wikidata_entities(search_term, language="en", entity_type="item", limit=7):
+    """
+    Searches Wikidata for entities (items or properties) by label, without any UI side effects.
+    Returns a tuple: (list of (label, id, description), error_message_str or None)
+    """
+    import requests
+
+    API_ENDPOINT = "https://www.wikidata.org/w/api.php"
+    params = {
+        "action": "wbsearchentities",
+        "format": "json",
+        "language": language,
+        "uselang": language,
+        "search": search_term,
+        "limit": limit,
+        "type": entity_type
+    }
+    headers = {
+        "User-Agent": USER_AGENT
+    }
+    try:
+        response = requests.get(API_ENDPOINT, params=params, headers=headers, timeout=10) # Added timeout
+        response.raise_for_status()
+        results = response.json()
+
+        if "search" in results:
+            formatted_results = []
+            for item in results["search"]:
+                label = item.get("label", "No label")
+                item_id = item.get("id")
+                description = item.get("description", "No description")
+                if item_id:
+                    formatted_results.append((label, item_id, description))
+            return formatted_results, None
+        return [], None
+    except requests.exceptions.Timeout:
+        return [], f"Wikidata API request timed out for '{search_term}'."
+    except requests.exceptions.RequestException as e:
+        return [], f"Error searching Wikidata for '{search_term}': {e}"
+    except ValueError as e:
+        return [], f"Error decoding JSON from Wikidata API for '{search_term}': {e}"
+
+def query_local_endpoint(query_string, endpoint_url):
+    """
+    Runs the query against the local store named by a local:// endpoint URL.
+    Returns a tuple: (SPARQL JSON results dict or None, error_message_str or None)
+    """
+    from local_store import LocalStoreError, query_local_store
+
+    store_path = endpoint_url[len(LOCAL_ENDPOINT_PREFIX):]
+    try:
+        return query_local_store(store_path, query_string), None
+    except LocalStoreError as e_store:
+        return None, str(e_store)
+    except Exception as e:
+        return None, f"Грешка при изпълнение на локалната заявка: {e}"
+
+def sparql_json_to_dataframe(raw_results):
+    """Returns a tuple: (pandas.DataFrame or None, raw_results, error_message_str or None)"""
+    import pandas as pd
+
+    if "results" in raw_results and "bindings" in raw_results["results"]:
+        bindings = raw_results["results"]["bindings"]
+        if not bindings:
+            return pd.DataFrame(columns=raw_results.get("head", {}).get("vars", [])), raw_results, None
+
+        data = []
+        for item in bindings:
+            row = {}
+            for var_name in raw_results.get("head", {}).get("vars", []):
+                if var_name in item:
+                    row[var_name] = item[var_name].get('value', None)
+                else:
+                    row[var_name] = None
+            data.append(row)
+        return pd.DataFrame(data), raw_results, None
+    elif "boolean" in raw_results:
+        return None, raw_results, None
+    else:
+        return None, raw_results, "Неочакван JSON."
+
+def execute_sparql_query(query_string, endpoint_url, return_format_header="application/sparql-results+json", timeout=60, cache_dir=None):
+    """
+    Executes a SPARQL query against the given endpoint (HTTP URL or local://<store>).
+    With cache_dir, JSON responses are kept in that result store and revalidated with
+    If-None-Match / If-Modified-Since; a 304 reuses the stored body.
+    Returns a tuple: (pandas.DataFrame or None, raw_results_dict_or_str, error_message_str or None)
+    """
+    if endpoint_url.startswith(LOCAL_ENDPOINT_PREFIX):
+        raw_results, err_msg = query_local_endpoint(query_string, endpoint_url)
+        if err_msg:
+            return None, None, err_msg
+        return sparql_json_to_dataframe(raw_results)
+
+    import requests
+    import pandas as pd
+
+    headers = {
+        "Accept": return_format_header,
+        "User-Agent": USER_AGENT
+    }
+    params = {
+        "query": query_string,
+        "format": "json"
+    }
+    if cache_dir:
+        import result_cache
+        headers.update(result_cache.conditional_headers(result_cache.load_meta(cache_dir, endpoint_url, query_string)))
+
+    try:
+        response = requests.get(endpoint_url, params=params, headers=headers, timeout=timeout) # 60s timeout for query by default
+        if response.status_code == 304 and cache_dir:
+            raw_results = json.loads(result_cache.load_body(cache_dir, endpoint_url, query_string))
+            result_cache.record_not_modified(cache_dir, endpoint_url, query_string)
+            return sparql_json_to_dataframe(raw_results)
+        response.raise_for_status()
+
+        content_type = response.headers.get("Content-Type", "").lower()
+
+        if "application/sparql-results+json" in content_type or "application/json" in content_type:
+            raw_results = response.json()
+            if cache_dir and isinstance(raw_results, dict) and ("boolean" in raw_results or "results" in raw_results):
+                result_cache.record_response(
+                    cache_dir, endpoint_url, query_string, response.text, raw_results,
+                    etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified")
+                )
+            return sparql_json_to_dataframe(raw_results)
+        elif "application/sparql-results+xml" in content_type or "application/xml" in content_type:
+            return None, response.text, "XML Получен."
+        elif "text/csv" in content_type:
+            csv_string = response.text
+            try:
+                df = pd.read_csv(io.StringIO(csv_string))
+                return df, csv_string, None
+            except Exception as e_csv:
+                 return None, csv_string, f"CSV получен, но грешка в парсването му в pandas: {e_csv}"
+        else:
+            return None, response.text, f"Незнаен тип съдържание: {content_type}. Суров респонс показвам."
+
+    except requests.exceptions.Timeout:
+        return None, None, f"{timeout}-секундовият таймаут мина за: {endpoint_url}."
+    except requests.exceptions.HTTPError as e_http:
+        error_detail = e_http.response.text[:500] if e_http.response else str(e_http)
+        return None, None, f"HTTP грешка за заявка: {e_http}. Детайли: {error_detail}"
+    except requests.exceptions.RequestException as e_req:
+        return None, None, f"Рекуест грешка за заявка: {e_req}"
+    except ValueError as e_json:
+        return None, response.text if 'response' in locals() else None, f"Грешка при обработка на JSON: {e_json}. Възможно е да има суров резултат."
+    except Exception as e:
+        return None, None, f"Незнайна грешка по време на изпълнението на заявката: {e}"